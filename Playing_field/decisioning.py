@@ -0,0 +1,228 @@
+import operator
+from typing import Dict, Any, List
+
+import numpy as np
+import pandas as pd
+
+# --- APR PRICING ---
+# (minimum credit score, band, lowest APR, highest APR); decisioning prices at the band midpoint
+APR_BANDS = [
+    (780, "A", 2.5, 5.0),  # Excellent credit
+    (700, "B", 5.1, 8.5),  # Good credit
+    (620, "C", 8.6, 12.0),  # Fair credit
+    (0, "D", 12.1, 19.5)  # Poor credit
+]
+
+# --- DEFAULT RULESET ---
+# Rules are (reason code, column, operator, threshold). A threshold may name another column.
+DEFAULT_RULESET = {
+    "expenses": {
+        "base": 650.0,  # Monthly living costs for a single applicant
+        "per_dependant": 250.0,
+        "income_share": 0.10  # Discretionary spend that grows with income
+    },
+    "affordability_ratio": 0.5,  # Share of disposable income that may go on the repayment
+    "apr_bands": APR_BANDS,
+    "decline_rules": [
+        ("D01_LOW_SCORE", "credit_score", "<", 560),
+        ("D02_NO_DISPOSABLE_INCOME", "disposable_income", "<=", 0),
+        ("D03_OVER_MAX_FINANCE", "requested_amount", ">", "max_finance_amount"),
+        ("D04_HIGH_DEBT_TO_INCOME", "debt_to_income", ">", 0.5)
+    ],
+    "refer_rules": [
+        ("R01_FAIR_SCORE", "credit_score", "<", 620),
+        ("R02_THIN_MARGIN", "loan_to_max_finance", ">", 0.8)
+    ]
+}
+
+APPROVE_REASON = "A00_AUTO_APPROVE"
+MISSING_DATA_REASON = "D00_MISSING_DATA"  # Always the first decline, checked before any pricing
+INVALID_INPUT_REASON = "D00_INVALID_INPUT"  # Non-positive term or requested amount; checked right after
+REQUIRED_COLUMNS = ("monthly_income", "credit_score", "requested_amount", "term_months")
+
+_OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne
+}
+
+CompiledRuleset = Dict[str, Any]
+
+
+# --- COMPILATION ---
+
+def _compile_rules(rules: List[tuple]) -> List[Dict[str, Any]]:
+    """Resolves each rule's operator once, so evaluation is a straight vectorized comparison."""
+    compiled = []
+    for code, column, op, threshold in rules:
+        if op not in _OPERATORS:
+            raise ValueError(f"Rule {code}: unknown operator '{op}'")
+        compiled.append({
+            "code": code,
+            "column": column,
+            "compare": _OPERATORS[op],
+            "threshold": threshold,
+            "threshold_is_column": isinstance(threshold, str)
+        })
+    return compiled
+
+
+def compile_ruleset(ruleset: Dict[str, Any] = DEFAULT_RULESET) -> CompiledRuleset:
+    """
+    Turns a ruleset into lookup arrays and pre-resolved rules.
+    Compile once per ruleset and reuse the result for every batch.
+    """
+    bands = sorted(ruleset["apr_bands"])  # Ascending by minimum score for np.searchsorted
+    decline_rules = _compile_rules(ruleset["decline_rules"])
+    refer_rules = _compile_rules(ruleset["refer_rules"])
+
+    return {
+        "expenses": dict(ruleset["expenses"]),
+        "affordability_ratio": float(ruleset["affordability_ratio"]),
+        "band_min_scores": np.array([band[0] for band in bands]),
+        "band_names": np.array([band[1] for band in bands]),
+        "band_aprs": np.array([round((band[2] + band[3]) / 2, 2) for band in bands]),
+        "decline_rules": decline_rules,
+        "refer_rules": refer_rules,
+        # Reason codes in priority order: input checks, declines, referrals, then the approval
+        "reason_codes": np.array(
+            [MISSING_DATA_REASON, INVALID_INPUT_REASON] + [rule["code"] for rule in decline_rules + refer_rules]
+            + [APPROVE_REASON]
+        )
+    }
+
+
+# --- EVALUATION ---
+
+def _evaluate_rules(rules: List[Dict[str, Any]], columns: Dict[str, np.ndarray], n_rows: int) -> np.ndarray:
+    """Returns a (n_rules, n_rows) boolean matrix of triggered rules."""
+    triggered = np.zeros((len(rules), n_rows), dtype=bool)
+    for index, rule in enumerate(rules):
+        threshold = columns[rule["threshold"]] if rule["threshold_is_column"] else rule["threshold"]
+        triggered[index] = rule["compare"](columns[rule["column"]], threshold)
+    return triggered
+
+
+def _annuity_factor(apr: np.ndarray, term_months: np.ndarray) -> np.ndarray:
+    """Present value of 1 per month, matching the monthly-rate annuity in calculations.py."""
+    monthly_rate = (apr / 100) / 12
+    safe_rate = np.where(monthly_rate == 0, 1.0, monthly_rate)
+    factor = (1 - (1 + safe_rate) ** -term_months) / safe_rate
+    return np.where(monthly_rate == 0, term_months, factor)
+
+
+def decide_applications(applications: pd.DataFrame, compiled: CompiledRuleset) -> pd.DataFrame:
+    """
+    Scores a whole batch of applications at once.
+
+    Required columns: monthly_income, credit_score, requested_amount, term_months.
+    Optional columns (default 0 when absent): dependants, housing_cost, existing_commitments.
+    A missing required column or a NaN in any input declines the row with D00_MISSING_DATA;
+    a term or requested amount that is not positive declines it with D00_INVALID_INPUT.
+
+    Estimated Expenses = Base + Per Dependant * Dependants + Income Share * Income
+                         + Housing Cost + Existing Commitments
+    Disposable Income = Income - Estimated Expenses
+    Maximum Finance Amount = Disposable Income * Affordability Ratio * Annuity Factor(band APR, term)
+
+    Each row gets DECLINE if any decline rule fires, REFER (manual underwriting) if any refer
+    rule fires, APPROVE otherwise. 'reason_code' is the highest-priority rule that fired and
+    'reason_flags' is a bitmask of every rule that fired, in compiled rule order.
+    """
+    n_rows = len(applications)
+
+    def column(name: str) -> np.ndarray:
+        if name in applications:
+            return applications[name].to_numpy(np.float64)
+        return np.full(n_rows, np.nan) if name in REQUIRED_COLUMNS else np.zeros(n_rows)
+
+    income = column("monthly_income")
+    credit_score = column("credit_score")
+    requested_amount = column("requested_amount")
+    term_months = column("term_months")
+    commitments = column("existing_commitments")
+    dependants = column("dependants")
+    housing_cost = column("housing_cost")
+
+    # --- MISSING DATA (before any band lookup: NaN must never be priced or approved) ---
+    # A NaN in a present optional column would also silently fail every rule, so it counts too
+    missing_data = np.isnan(np.vstack([income, credit_score, requested_amount, term_months,
+                                       commitments, dependants, housing_cost])).any(axis=0)
+    invalid_input = ~missing_data & ((term_months <= 0) | (requested_amount <= 0))
+
+    # --- AFFORDABILITY ---
+    expenses = compiled["expenses"]
+    estimated_expenses = (expenses["base"] + expenses["per_dependant"] * dependants
+                          + expenses["income_share"] * income + housing_cost + commitments)
+    disposable_income = income - estimated_expenses
+
+    # --- APR BAND ---
+    # A missing score is looked up as the poorest band rather than sorting past the best one
+    band_index = np.searchsorted(compiled["band_min_scores"], np.where(missing_data, -np.inf, credit_score),
+                                 side="right") - 1
+    band_index = np.clip(band_index, 0, len(compiled["band_min_scores"]) - 1)
+    apr = compiled["band_aprs"][band_index]
+
+    # A negative term would give a negative annuity factor; clamping keeps those rows at zero finance
+    annuity_factor = _annuity_factor(apr, np.maximum(term_months, 0))
+    max_payment = np.maximum(disposable_income, 0) * compiled["affordability_ratio"]
+    max_finance_amount = np.round(max_payment * annuity_factor, 2)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        loan_to_max_finance = np.where(max_finance_amount > 0, requested_amount / max_finance_amount, np.inf)
+        debt_to_income = np.where(income > 0, commitments / income, np.inf)
+
+    columns = {
+        "monthly_income": income,
+        "credit_score": credit_score,
+        "requested_amount": requested_amount,
+        "term_months": term_months,
+        "estimated_expenses": estimated_expenses,
+        "disposable_income": disposable_income,
+        "max_finance_amount": max_finance_amount,
+        "loan_to_max_finance": loan_to_max_finance,
+        "debt_to_income": debt_to_income,
+        "apr": apr
+    }
+
+    # --- RULES ---
+    triggered = np.vstack([
+        missing_data[None, :],
+        invalid_input[None, :],
+        _evaluate_rules(compiled["decline_rules"], columns, n_rows),
+        _evaluate_rules(compiled["refer_rules"], columns, n_rows),
+        np.ones((1, n_rows), dtype=bool)  # The approval always "fires" last
+    ])
+    n_declines = 2 + len(compiled["decline_rules"])
+    n_rules = len(compiled["reason_codes"]) - 1
+
+    first_reason = np.argmax(triggered, axis=0)
+    decision = np.select(
+        [first_reason < n_declines, first_reason < n_rules],
+        ["DECLINE", "REFER"],
+        default="APPROVE"
+    )
+    reason_flags = (triggered[:n_rules].T.astype(np.int64) << np.arange(n_rules, dtype=np.int64)).sum(axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        monthly_repayment = np.where((decision != "DECLINE") & (annuity_factor > 0),
+                                     np.round(requested_amount / annuity_factor, 2), np.nan)
+
+    result = pd.DataFrame({
+        "estimated_expenses": np.round(estimated_expenses, 2),
+        "disposable_income": np.round(disposable_income, 2),
+        "max_finance_amount": max_finance_amount,
+        "apr_band": compiled["band_names"][band_index],
+        "apr": apr,
+        "monthly_repayment": monthly_repayment,
+        "decision": decision,
+        "reason_code": compiled["reason_codes"][first_reason],
+        "reason_flags": reason_flags
+    }, index=applications.index)
+
+    if "application_id" in applications:
+        result.insert(0, "application_id", applications["application_id"])
+    return result
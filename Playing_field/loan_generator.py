@@ -1,6 +1,8 @@
 import random
 from models import Borrower  # Still useful for internal validation
 from loan_system import initialize_loan_book, add_borrower, create_loan, LoanBookSystem
+from decisioning import APR_BANDS
+from loan_journal import attach_journal, checkpoint_if_due
 
 # --- Sample Data for Realistic Generation ---
 
@@ -20,19 +22,14 @@ _SAMPLE_LAST_NAMES = [
 # --- Helper Functions ---
 
 def _generate_apr_for_score(credit_score: int) -> float:
-    """Generates a realistic APR based on credit score."""
-    if credit_score >= 780:
-        # Excellent credit
-        apr = random.uniform(2.5, 5.0)
-    elif credit_score >= 700:
-        # Good credit
-        apr = random.uniform(5.1, 8.5)
-    elif credit_score >= 620:
-        # Fair credit
-        apr = random.uniform(8.6, 12.0)
+    """Generates a realistic APR within the decisioning APR band for the credit score."""
+    for min_score, _, apr_low, apr_high in APR_BANDS:
+        if credit_score >= min_score:
+            apr = random.uniform(apr_low, apr_high)
+            break
     else:
-        # Poor credit
-        apr = random.uniform(12.1, 19.5)
+        # Below every band: price as the poorest band
+        apr = random.uniform(APR_BANDS[-1][2], APR_BANDS[-1][3])
     return round(apr, 2)
 
 
@@ -48,11 +45,14 @@ def _generate_random_borrower_data(borrower_id: str) -> dict:
 
 # --- Main Public Function ---
 
-def populate_loanbook(num_to_create: int) -> LoanBookSystem:
+def populate_loanbook(num_to_create: int, journal_dir: str | None = None) -> LoanBookSystem:
     """
     Creates and returns a loan book system dictionary populated with random loans.
+    With `journal_dir`, every change is journaled and a snapshot is taken at the end of the batch if one is due.
     """
     system = initialize_loan_book()
+    if journal_dir is not None:
+        attach_journal(system, journal_dir)
 
     print(f"Generating {num_to_create} random loans...")
     for i in range(1, num_to_create + 1):
@@ -85,5 +85,8 @@ def populate_loanbook(num_to_create: int) -> LoanBookSystem:
             months=term
         )
 
+    # End of the batch: a natural point to checkpoint, so no single create waits on a snapshot
+    checkpoint_if_due(system)
+
     print(f"Successfully populated system with {len(system['loans'])} loans.")
     return system
\ No newline at end of file
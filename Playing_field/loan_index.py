@@ -0,0 +1,203 @@
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Dict, Any, FrozenSet, Iterable, List, Tuple
+
+# Fields indexed with hash buckets (value -> set of loan IDs)
+DEFAULT_CATEGORICAL_FIELDS = ("status", "borrower_id")
+# Fields indexed with sorted arrays (parallel lists of keys and loan IDs)
+DEFAULT_DATE_FIELDS = ("maturity_date", "start_date")  # start_date is the contract date
+# (categorical field, date field) pairs with one sorted array per categorical value,
+# so filtered range queries such as "active loans maturing next month" are a single bisect-and-slice
+DEFAULT_COMPOSITE_FIELDS = (("status", "maturity_date"), ("status", "start_date"))
+
+LoanIndexes = Dict[str, Dict[str, Any]]
+
+
+def _sorted_column(entries: List[Tuple[date, str]]) -> Dict[str, List[Any]]:
+    entries.sort()
+    return {
+        "keys": [key for key, _ in entries],
+        "ids": [l_id for _, l_id in entries]
+    }
+
+
+def _entry_position(column: Dict[str, List[Any]], key: date, l_id: str) -> int:
+    # Leftmost position for (key, l_id), so ties on the date are ordered by loan ID exactly as
+    # build_indexes sorts them and incremental inserts never drift from a fresh build
+    keys, ids = column["keys"], column["ids"]
+    low, high = 0, len(keys)
+    while low < high:
+        mid = (low + high) // 2
+        if (keys[mid], ids[mid]) < (key, l_id):
+            low = mid + 1
+        else:
+            high = mid
+    return low
+
+
+def _insert_sorted(column: Dict[str, List[Any]], key: date, l_id: str) -> None:
+    position = _entry_position(column, key, l_id)
+    column["keys"].insert(position, key)
+    column["ids"].insert(position, l_id)
+
+
+def _remove_sorted(column: Dict[str, List[Any]], key: date, l_id: str) -> None:
+    position = _entry_position(column, key, l_id)
+    if position < len(column["ids"]) and column["ids"][position] == l_id:
+        del column["keys"][position]
+        del column["ids"][position]
+
+
+def build_indexes(system: Dict[str, Any],
+                  categorical_fields: Iterable[str] = DEFAULT_CATEGORICAL_FIELDS,
+                  date_fields: Iterable[str] = DEFAULT_DATE_FIELDS,
+                  composite_fields: Iterable[Tuple[str, str]] = DEFAULT_COMPOSITE_FIELDS) -> LoanIndexes:
+    """
+    Builds the secondary indexes for every loan in the book (one sort per date field)
+    and stores them on the system, where the loan_system functions keep them up to date.
+    """
+    indexes = {
+        "categorical": {field: {} for field in categorical_fields},
+        "sorted": {},
+        "composite": {}
+    }
+
+    for loan in system["loans"].values():
+        for field, buckets in indexes["categorical"].items():
+            buckets.setdefault(loan.get(field), set()).add(loan["id"])
+
+    for field in date_fields:
+        entries = [(loan[field], loan["id"]) for loan in system["loans"].values() if loan.get(field)]
+        indexes["sorted"][field] = _sorted_column(entries)
+
+    for group_field, date_field in composite_fields:
+        groups = {}
+        for loan in system["loans"].values():
+            if loan.get(date_field):
+                groups.setdefault(loan.get(group_field), []).append((loan[date_field], loan["id"]))
+        indexes["composite"][(group_field, date_field)] = {
+            value: _sorted_column(entries) for value, entries in groups.items()
+        }
+
+    system["indexes"] = indexes
+    return indexes
+
+
+# --- INCREMENTAL MAINTENANCE ---
+
+def index_loan(system: Dict[str, Any], loan: Dict[str, Any]) -> None:
+    """
+    Adds a newly created loan to every index (no-op when the book is not indexed).
+    Each sorted array insert is a binary search plus an O(n) list shift: about a few ms per array
+    at 1M loans. For bulk loads, add the loans first and call build_indexes once instead.
+    """
+    indexes = system.get("indexes")
+    if indexes is None:
+        return
+
+    for field, buckets in indexes["categorical"].items():
+        buckets.setdefault(loan.get(field), set()).add(loan["id"])
+
+    for field, column in indexes["sorted"].items():
+        if loan.get(field) is not None:
+            _insert_sorted(column, loan[field], loan["id"])
+
+    for (group_field, date_field), groups in indexes["composite"].items():
+        if loan.get(date_field) is not None:
+            column = groups.setdefault(loan.get(group_field), {"keys": [], "ids": []})
+            _insert_sorted(column, loan[date_field], loan["id"])
+
+
+def reindex_loan(system: Dict[str, Any], loan: Dict[str, Any], old_values: Dict[str, Any]) -> None:
+    """
+    Moves a loan between hash buckets and composite arrays after a change,
+    e.g. reindex_loan(system, loan, {"status": "active"}).
+    Only categorical fields can change after creation; the indexed dates are fixed by the contract.
+    A status change moves the loan between composite arrays, one O(n) delete and insert per array.
+    """
+    indexes = system.get("indexes")
+    if indexes is None:
+        return
+
+    for field, old_value in old_values.items():
+        buckets = indexes["categorical"].get(field)
+        if buckets is None or old_value == loan.get(field):
+            continue
+        bucket = buckets.get(old_value)
+        if bucket is not None:
+            bucket.discard(loan["id"])
+            if not bucket:
+                del buckets[old_value]
+        buckets.setdefault(loan.get(field), set()).add(loan["id"])
+
+    for (group_field, date_field), groups in indexes["composite"].items():
+        if group_field not in old_values or old_values[group_field] == loan.get(group_field):
+            continue
+        if loan.get(date_field) is None:
+            continue
+        old_column = groups.get(old_values[group_field])
+        if old_column is not None:
+            _remove_sorted(old_column, loan[date_field], loan["id"])
+        new_column = groups.setdefault(loan.get(group_field), {"keys": [], "ids": []})
+        _insert_sorted(new_column, loan[date_field], loan["id"])
+
+
+# --- QUERIES ---
+
+def _bucket(system: Dict[str, Any], field: str, value: Any) -> set:
+    return system["indexes"]["categorical"][field].get(value, set())
+
+
+def loans_with(system: Dict[str, Any], field: str, value: Any) -> FrozenSet[str]:
+    """Loan IDs whose categorical `field` equals `value`, e.g. loans_with(system, "borrower_id", "CUST-0001")."""
+    return frozenset(_bucket(system, field, value))
+
+
+def _slice(column: Dict[str, List[Any]], start: date, end: date) -> List[str]:
+    low = bisect_left(column["keys"], start)
+    high = bisect_right(column["keys"], end)
+    return column["ids"][low:high]
+
+
+def loans_between(system: Dict[str, Any], field: str, start: date, end: date) -> List[str]:
+    """Loan IDs whose date `field` falls in [start, end], in date order."""
+    return _slice(system["indexes"]["sorted"][field], start, end)
+
+
+def find_loans(system: Dict[str, Any], date_field: str | None = None, start: date | None = None,
+               end: date | None = None, **filters: Any) -> List[str]:
+    """
+    Combines a date range with equality filters on categorical fields, e.g. live loans maturing next month:
+        find_loans(system, "maturity_date", date(2026, 1, 1), date(2026, 1, 31), status="active")
+    A single filter with a composite index is a pure bisect-and-slice. Otherwise the smallest
+    candidate set is scanned and checked against the other buckets.
+    """
+    if date_field is not None:
+        start, end = start or date.min, end or date.max
+        composite = system["indexes"]["composite"]
+        if len(filters) == 1:
+            (field, value), = filters.items()
+            if (field, date_field) in composite:
+                column = composite[(field, date_field)].get(value)
+                return _slice(column, start, end) if column else []
+
+    candidates = sorted((_bucket(system, field, value) for field, value in filters.items()), key=len)
+
+    if date_field is not None:
+        in_range = loans_between(system, date_field, start, end)
+        if not candidates or len(in_range) <= len(candidates[0]):
+            return [l_id for l_id in in_range if all(l_id in bucket for bucket in candidates)]
+
+        # A filter bucket is smaller than the date range: scan the bucket and check the dates instead
+        loans = system["loans"]
+        matches = [
+            l_id for l_id in candidates[0]
+            if loans[l_id].get(date_field) and start <= loans[l_id][date_field] <= end
+            and all(l_id in bucket for bucket in candidates[1:])
+        ]
+        return sorted(matches, key=lambda l_id: loans[l_id][date_field])
+
+    if not candidates:
+        return list(system["loans"])
+
+    return [l_id for l_id in candidates[0] if all(l_id in bucket for bucket in candidates[1:])]
@@ -0,0 +1,275 @@
+import json
+import os
+from datetime import date
+from typing import Dict, Any, List, Tuple
+
+from loan_index import build_indexes
+
+# --- CONFIGURATION ---
+JOURNAL_FILE = "events.jsonl"
+SNAPSHOT_PREFIX = "snapshot-"
+DEFAULT_SNAPSHOT_EVERY = 10_000  # Events after which snapshot_due() suggests a checkpoint
+DEFAULT_SNAPSHOTS_KEPT = 3  # Most recent snapshots kept by write_snapshot (plus one per month)
+
+# Loan fields stored as ISO strings in the journal and snapshots
+_DATE_FIELDS = {"start_date", "maturity_date", "termination_date", "settlement_date"}
+# Loan fields only set once a loan defaults or settles; a columnar snapshot pads them with None
+_OPTIONAL_FIELDS = {"termination_date", "settlement_date"}
+
+Journal = Dict[str, Any]
+
+
+# --- SERIALISATION HELPERS ---
+
+def _to_json_value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def _encode_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: _to_json_value(value) for key, value in record.items()}
+
+
+def _decode_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Turns ISO date strings back into date objects for the known date fields."""
+    return {
+        key: date.fromisoformat(value) if key in _DATE_FIELDS and isinstance(value, str) else value
+        for key, value in record.items()
+    }
+
+
+def _to_columns(records: Dict[str, Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """Converts {id: record} into a columnar {field: [values]} layout."""
+    fields = []
+    for record in records.values():
+        for key in record:
+            if key not in fields:
+                fields.append(key)
+    return {field: [_to_json_value(record.get(field)) for record in records.values()] for field in fields}
+
+
+def _from_columns(columns: Dict[str, List[Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Converts a columnar layout back into {id: record}.
+    Optional fields padded with None are dropped, so records come back exactly as they were written.
+    """
+    if not columns:
+        return {}
+    rows = zip(*columns.values())
+    records = (
+        _decode_record({key: value for key, value in zip(columns.keys(), row)
+                        if value is not None or key not in _OPTIONAL_FIELDS})
+        for row in rows
+    )
+    return {record["id"]: record for record in records}
+
+
+# --- SNAPSHOT FILES ---
+
+def _snapshot_name(seq: int, as_of: date) -> str:
+    # Sequence and as-of date are in the name, so a snapshot can be chosen without opening any file
+    return f"{SNAPSHOT_PREFIX}{seq:012d}-{as_of:%Y%m%d}.json"
+
+
+def _list_snapshots(directory: str) -> List[Tuple[int, date, str]]:
+    """Returns (seq, as_of, path) for every snapshot, oldest first."""
+    snapshots = []
+    for name in os.listdir(directory):
+        if name.startswith(SNAPSHOT_PREFIX) and name.endswith(".json"):
+            seq, as_of = name[len(SNAPSHOT_PREFIX):-len(".json")].split("-")
+            snapshots.append((int(seq), date(int(as_of[:4]), int(as_of[4:6]), int(as_of[6:])),
+                              os.path.join(directory, name)))
+    return sorted(snapshots)
+
+
+def _latest_snapshot(directory: str, as_of: date | None = None) -> Dict[str, Any] | None:
+    """Loads the newest snapshot, or the newest one taken on or before `as_of`."""
+    candidates = [s for s in _list_snapshots(directory) if as_of is None or s[1] <= as_of]
+    if not candidates:
+        return None
+    with open(candidates[-1][2], "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# --- WRITING ---
+
+def open_journal(directory: str, snapshot_every: int = DEFAULT_SNAPSHOT_EVERY) -> Journal:
+    """
+    Opens (or creates) an event journal in `directory`.
+    Only the events after the latest snapshot are read to find the current position.
+    A torn final line (crash during a write) is truncated away.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, JOURNAL_FILE)
+
+    snapshot = _latest_snapshot(directory)
+    seq = snapshot["seq"] if snapshot else 0
+    offset = snapshot["offset"] if snapshot else 0
+    last_date = date.fromisoformat(snapshot["as_of"]) if snapshot else None
+    since_snapshot = 0
+
+    if os.path.exists(path):
+        with open(path, "rb+") as f:
+            f.seek(offset)
+            for line in iter(f.readline, b""):
+                if not line.endswith(b"\n"):
+                    f.truncate(offset)
+                    break
+                event = json.loads(line)
+                seq, last_date = event["seq"], date.fromisoformat(event["date"])
+                offset += len(line)
+                since_snapshot += 1
+
+    return {
+        "directory": directory,
+        "path": path,
+        "seq": seq,
+        "offset": offset,
+        "last_date": last_date,
+        "since_snapshot": since_snapshot,
+        "snapshot_every": snapshot_every
+    }
+
+
+def attach_journal(system: Dict[str, Any], directory: str,
+                   snapshot_every: int = DEFAULT_SNAPSHOT_EVERY) -> Journal:
+    """Attaches a journal so every state change made through loan_system is recorded."""
+    journal = open_journal(directory, snapshot_every)
+    system["journal"] = journal
+    return journal
+
+
+def record_event(system: Dict[str, Any], event_type: str, event_date: date, entity_id: str,
+                 changes: Dict[str, Any], **details: Any) -> None:
+    """
+    Appends one event to the system's journal (no-op when no journal is attached).
+    `changes` holds the fields as they are after the change; `details` carries extra
+    context (e.g. the settlement amount) that replay does not need.
+    Events are expected in date order, which holds while they are stamped with today's date.
+    Never snapshots: that is left to the caller (see snapshot_due / write_snapshot), so a
+    status change never waits on serialising the whole book.
+    """
+    journal = system.get("journal")
+    if journal is None:
+        return
+
+    event = {
+        "seq": journal["seq"] + 1,
+        "type": event_type,
+        "date": event_date.isoformat(),
+        "id": entity_id,
+        "changes": _encode_record(changes),
+        **details
+    }
+    line = (json.dumps(event, separators=(",", ":")) + "\n").encode("utf-8")
+    with open(journal["path"], "ab") as f:
+        f.write(line)
+
+    journal["seq"] += 1
+    journal["offset"] += len(line)
+    journal["last_date"] = event_date
+    journal["since_snapshot"] += 1
+
+
+def snapshot_due(system: Dict[str, Any]) -> bool:
+    """True once `snapshot_every` events have been journaled since the last snapshot."""
+    journal = system.get("journal")
+    return journal is not None and journal["since_snapshot"] >= journal["snapshot_every"]
+
+
+def prune_snapshots(directory: str, keep_latest: int = DEFAULT_SNAPSHOTS_KEPT) -> List[str]:
+    """
+    Deletes old snapshots, keeping the `keep_latest` newest plus the last snapshot of each month
+    so as-of reconstruction still starts close to any date. Returns the deleted paths.
+    """
+    snapshots = _list_snapshots(directory)
+    keep = {path for _, _, path in snapshots[-keep_latest:]} if keep_latest > 0 else set()
+    last_of_month = {}
+    for _, as_of, path in snapshots:
+        last_of_month[(as_of.year, as_of.month)] = path
+    keep.update(last_of_month.values())
+
+    deleted = [path for _, _, path in snapshots if path not in keep]
+    for path in deleted:
+        os.remove(path)
+    return deleted
+
+
+def write_snapshot(system: Dict[str, Any], keep_latest: int = DEFAULT_SNAPSHOTS_KEPT) -> str:
+    """
+    Writes a columnar snapshot of the book at the journal's current position, then prunes old ones.
+    Call it at a quiet point (end of a batch, before shutdown), e.g. when snapshot_due() is True.
+    The file is written to a temporary name first, so a crash never leaves a partial snapshot.
+    """
+    journal = system["journal"]
+    as_of = journal["last_date"] or date.today()
+    snapshot = {
+        "seq": journal["seq"],
+        "offset": journal["offset"],
+        "as_of": as_of.isoformat(),
+        "loans": _to_columns(system["loans"]),
+        "borrowers": _to_columns(system["borrowers"])
+    }
+
+    path = os.path.join(journal["directory"], _snapshot_name(journal["seq"], as_of))
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, separators=(",", ":"))
+    os.replace(path + ".tmp", path)
+
+    journal["since_snapshot"] = 0
+    prune_snapshots(journal["directory"], keep_latest)
+    return path
+
+
+def checkpoint_if_due(system: Dict[str, Any], keep_latest: int = DEFAULT_SNAPSHOTS_KEPT) -> str | None:
+    """Writes a snapshot when one is due; meant for batch boundaries. Returns the path, or None."""
+    if not snapshot_due(system):
+        return None
+    return write_snapshot(system, keep_latest)
+
+
+# --- RECOVERY ---
+
+def apply_event(system: Dict[str, Any], event: Dict[str, Any]) -> None:
+    """Applies one journal event to the book (used by replay; does not journal again)."""
+    changes = _decode_record(event["changes"])
+    if event["type"] == "add_borrower":
+        system["borrowers"][event["id"]] = changes
+    elif event["type"] == "create_loan":
+        system["loans"][event["id"]] = changes
+    else:
+        system["loans"][event["id"]].update(changes)
+
+
+def restore_loan_book(system: Dict[str, Any], directory: str, as_of: date | None = None) -> Dict[str, Any]:
+    """
+    Rebuilds the book into `system` (an empty book from initialize_loan_book).
+
+    Loads the latest snapshot, then replays only the events written after it.
+    With `as_of`, the newest snapshot on or before that date is used and replay stops at
+    the first later event, giving the book as it stood at the end of that day.
+    If the book was indexed, the indexes are rebuilt (same fields) for the restored loans.
+    """
+    snapshot = _latest_snapshot(directory, as_of)
+    offset = 0
+    if snapshot:
+        system["loans"] = _from_columns(snapshot["loans"])
+        system["borrowers"] = _from_columns(snapshot["borrowers"])
+        offset = snapshot["offset"]
+
+    path = os.path.join(directory, JOURNAL_FILE)
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in iter(f.readline, b""):
+                if not line.endswith(b"\n"):
+                    break  # Torn final write
+                event = json.loads(line)
+                if as_of is not None and date.fromisoformat(event["date"]) > as_of:
+                    break
+                apply_event(system, event)
+
+    indexes = system.get("indexes")
+    if indexes is not None:
+        build_indexes(system, indexes["categorical"], indexes["sorted"], indexes["composite"])
+
+    return system
@@ -3,6 +3,8 @@ from dateutil.relativedelta import relativedelta
 from typing import Dict, Any
 from models import Borrower, Loan
 from calculations import calculate_monthly_payment
+from loan_index import index_loan, reindex_loan
+from loan_journal import record_event
 
 # Define the global structure type for clarity
 LoanBookSystem = Dict[str, Dict[str, Any]]
@@ -26,6 +28,7 @@ def add_borrower(system: LoanBookSystem, b_id: str, first: str, last: str, score
 
     # 2. Store it
     system["borrowers"][b_id] = borrower_data
+    record_event(system, "add_borrower", date.today(), b_id, borrower_data)
     return borrower_data
 
 
@@ -64,6 +67,8 @@ def create_loan(system: LoanBookSystem, l_id: str, b_id: str, principal: float,
 
     # 5. Store it
     system["loans"][l_id] = loan_data
+    index_loan(system, loan_data)
+    record_event(system, "create_loan", start_date, l_id, loan_data)
     return loan_data
 
 
@@ -88,8 +93,12 @@ def default_loan(system: LoanBookSystem, l_id: str, reason: str = "Failure to pa
         print(f"Loan {l_id} cannot be defaulted. Current status: {loan['status']}")
         return False
 
+    old_status = loan["status"]
     loan["status"] = "default"
     loan["termination_date"] = date.today()  # NEW: Record the default date
+    reindex_loan(system, loan, {"status": old_status})
+    record_event(system, "default", loan["termination_date"], l_id,
+                 {"status": loan["status"], "termination_date": loan["termination_date"]}, reason=reason)
     print(f"Loan {l_id} is now set to DEFAULT. Reason: {reason}")
     return True
 
@@ -111,9 +120,13 @@ def settle_loan(system: LoanBookSystem, l_id: str) -> bool:
         print(
             f"Warning: Settling loan {l_id} while balance is {loan['outstanding_balance']:,.2f}. Balance is being set to 0.0.")
 
+    old_status = loan["status"]
     loan["outstanding_balance"] = 0.0
     loan["status"] = "settled"
     loan["settlement_date"] = date.today()  # NEW: Record the settlement date
+    reindex_loan(system, loan, {"status": old_status})
+    record_event(system, "settle", loan["settlement_date"], l_id,
+                 {"outstanding_balance": 0.0, "status": loan["status"], "settlement_date": loan["settlement_date"]})
     print(f"Loan {l_id} is now fully SETTLED. Outstanding balance is zero.")
     return True
 
@@ -155,6 +168,11 @@ def partial_settle_loan(system: LoanBookSystem, l_id: str, settlement_amount: fl
         loan["outstanding_balance"] = 0.0
         loan["status"] = "paid_off"
         loan["settlement_date"] = date.today()  # NEW: Record the settlement date
+        reindex_loan(system, loan, {"status": "active"})
         print(f"Partial settlement resulted in full payoff. Loan {l_id} is now PAID OFF.")
 
+    changes = {"outstanding_balance": loan["outstanding_balance"], "status": loan["status"]}
+    if loan["status"] == "paid_off":
+        changes["settlement_date"] = loan["settlement_date"]
+    record_event(system, "partial_settlement", date.today(), l_id, changes, amount=settlement_amount)
     return True
\ No newline at end of file
@@ -0,0 +1,278 @@
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from loan_calc import create_schedule_indexes
+
+# --- CONFIGURATION ---
+DB_FILE = 'loan_data.db'
+SOURCE_TABLE = 'loans'
+TARGET_TABLE = 'repayment_schedules'
+
+# Rounding modes for _divide_and_round
+HALF_UP = 'half_up'
+HALF_EVEN = 'half_even'  # Banker's rounding
+
+# Fixed-point scales
+APR_SCALE = 1_000_000  # APR held in millionths of a percent (matches the 6dp 'nominal_apr' column)
+CHUNK_LOANS = 20_000  # Loans per batch; bounds the (loans x term) matrices held in memory at once
+APR_SOLVER_ITERATIONS = 40  # Bisection steps on [0, 100]: 100 / 2^40 is well inside the 1e-6 tolerance
+
+
+def _divide_and_round(numerator, denominator, rounding=HALF_UP):
+    """
+    Vectorized integer division with explicit rounding: round(numerator / denominator).
+    Works entirely in int64, so the result never depends on float rounding order.
+    The denominator must be positive.
+    """
+    quotient, remainder = np.divmod(numerator, denominator)
+    twice_remainder = 2 * remainder
+
+    if rounding == HALF_UP:
+        round_up = twice_remainder >= denominator
+    elif rounding == HALF_EVEN:
+        round_up = (twice_remainder > denominator) | ((twice_remainder == denominator) & (quotient % 2 == 1))
+    else:
+        raise ValueError(f"Unknown rounding mode: {rounding}")
+
+    return quotient + round_up.astype(np.int64)
+
+
+def payment_date_matrix(contract_dates, max_term):
+    """
+    Builds an (n_loans, max_term + 1) matrix of dates; column 0 is the contract date and
+    column k is the contract date plus k months. Like pd.DateOffset, the day of month is
+    clamped to the end of shorter months (31 Jan -> 28/29 Feb).
+    """
+    start = np.asarray(contract_dates, dtype='datetime64[D]')
+    start_month = start.astype('datetime64[M]')
+    day_offset = (start - start_month.astype('datetime64[D]')).astype(np.int64)
+
+    months = start_month[:, None] + np.arange(max_term + 1)[None, :]
+    month_start = months.astype('datetime64[D]')
+    month_length = ((months + 1).astype('datetime64[D]') - month_start).astype(np.int64)
+
+    return month_start + np.minimum(day_offset[:, None], month_length - 1)
+
+
+def _final_balances(apr, principal, payment, days, valid):
+    """Vectorized version of loan_calc.calculate_final_balance for a batch of loans."""
+    balance = principal.copy()
+    daily_rate = (apr / 100) / 365
+    for period in range(days.shape[1]):
+        stepped = balance + balance * daily_rate * days[:, period] - payment
+        balance = np.where(valid[:, period], stepped, balance)
+    return balance
+
+
+def solve_aprs(principal, payment, days, valid):
+    """
+    Solves every loan's APR at once by bisection on [0, 100].
+    Loans with no root in the interval get 0.0, as the brentq path in loan_calc does.
+    """
+    low = np.zeros(len(principal))
+    high = np.full(len(principal), 100.0)
+    has_root = _final_balances(low, principal, payment, days, valid) * \
+        _final_balances(high, principal, payment, days, valid) <= 0
+
+    for _ in range(APR_SOLVER_ITERATIONS):
+        mid = (low + high) / 2
+        too_low = _final_balances(mid, principal, payment, days, valid) < 0
+        low = np.where(too_low, mid, low)
+        high = np.where(too_low, high, mid)
+
+    return np.where(has_root, (low + high) / 2, 0.0)
+
+
+def contract_total_interest(finance_amount, flat_rate, term):
+    """
+    Total interest in pence exactly as car_loan_generator.calculate_repayments states it on the contract:
+    Finance Amount * Flat Rate * Term (Years), rounded to 2dp.
+    Used when a loan has no stored 'total_interest'. It never depends on the schedule's rounding mode.
+    """
+    total_interest = (np.asarray(finance_amount, dtype=np.float64) * (np.asarray(flat_rate, dtype=np.float64) / 100)
+                      * (np.asarray(term, dtype=np.float64) / 12))
+    return np.rint(np.round(total_interest, 2) * 100).astype(np.int64)
+
+
+def build_pence_schedules(principal_p, payment_p, term, total_interest_p, contract_dates, rounding=HALF_UP):
+    """
+    Builds schedules for many loans at once with all money held as int64 pence.
+
+    1. Contract totals come from the contract (`total_interest_p`), not from the schedule rounding:
+       Total Payable = Principal + Total Interest
+       Final Instalment = Total Payable - (Term - 1) * Monthly Repayment
+    2. Actuarial interest is accrued on the daily reducing balance (Act/365) at the solved APR,
+       rounded per period with the chosen mode.
+    3. The actuarial profile is scaled onto the contract interest by rounding the *cumulative*
+       interest, so the per-period amounts sum exactly to Total Interest and the balance closes
+       at exactly 0 with every period treated the same way.
+
+    Money inputs are int64 pence; balances up to roughly 29 million pounds fit without overflow.
+    Returns a dict of (n_loans, max_term) matrices plus the 'valid' period mask and the APRs.
+    """
+    principal_p = np.asarray(principal_p, dtype=np.int64)
+    payment_p = np.asarray(payment_p, dtype=np.int64)
+    term = np.asarray(term, dtype=np.int64)
+    max_term = int(term.max())
+
+    periods = np.arange(1, max_term + 1)
+    valid = periods[None, :] <= term[:, None]
+    is_final = periods[None, :] == term[:, None]
+
+    dates = payment_date_matrix(contract_dates, max_term)
+    days = np.diff(dates, axis=1).astype(np.int64)
+
+    # --- STEP 1: CONTRACT TOTALS ---
+    total_interest = np.asarray(total_interest_p, dtype=np.int64)
+    total_payable = principal_p + total_interest
+    final_payment = total_payable - (term - 1) * payment_p
+    repayment = np.where(is_final, final_payment[:, None], payment_p[:, None]) * valid
+
+    # --- STEP 2: ACTUARIAL INTEREST PROFILE ---
+    apr = solve_aprs(principal_p / 100, payment_p / 100, days, valid)
+    apr_units = np.rint(apr * APR_SCALE).astype(np.int64)
+    interest_denominator = 100 * APR_SCALE * 365
+
+    actuarial = np.zeros((len(term), max_term), dtype=np.int64)
+    balance = principal_p.copy()
+    for index in range(max_term):
+        accrued = _divide_and_round(np.maximum(balance, 0) * apr_units * days[:, index],
+                                    interest_denominator, rounding)
+        actuarial[:, index] = np.where(valid[:, index], accrued, 0)
+        balance = balance + actuarial[:, index] - repayment[:, index]
+
+    # --- STEP 3: RECONCILE TO CONTRACT INTEREST ---
+    cumulative = np.cumsum(actuarial, axis=1)
+    profile_total = cumulative[:, -1]
+
+    # Without an actuarial profile (0% APR) interest is spread evenly over the term
+    no_profile = profile_total == 0
+    cumulative = np.where(no_profile[:, None], np.cumsum(valid, axis=1), cumulative)
+    profile_total = np.where(no_profile, term, profile_total)
+
+    cumulative_interest = _divide_and_round(cumulative * total_interest[:, None], profile_total[:, None], rounding)
+    interest = np.diff(cumulative_interest, axis=1, prepend=0) * valid
+
+    closing = principal_p[:, None] - np.cumsum(repayment - interest, axis=1)
+    opening = np.concatenate([principal_p[:, None], closing[:, :-1]], axis=1)
+
+    return {
+        'valid': valid,
+        'payment_date': dates[:, 1:],
+        'days_in_period': days,
+        'apr': apr_units / APR_SCALE,
+        'opening_balance': opening,
+        'interest_amount': interest,
+        'repayment_amount': repayment,
+        'closing_balance': closing,
+        'total_interest': total_interest,
+        'total_payable': total_payable
+    }
+
+
+def _build_chunk(chunk_df, rounding):
+    """Builds the schedule rows for one batch of loans."""
+    total_interest_p = contract_total_interest(
+        chunk_df['finance_amount'], chunk_df['flat_rate_percent'], chunk_df['term_months']
+    )
+    if 'total_interest' in chunk_df:
+        stored = chunk_df['total_interest'].to_numpy(np.float64)
+        total_interest_p = np.where(np.isnan(stored), total_interest_p,
+                                    np.rint(np.nan_to_num(stored) * 100).astype(np.int64))
+
+    contract_dates = pd.to_datetime(chunk_df['contract_date'], errors='coerce').fillna(pd.Timestamp.now())
+
+    result = build_pence_schedules(
+        principal_p=np.rint(chunk_df['finance_amount'].to_numpy(np.float64) * 100).astype(np.int64),
+        payment_p=np.rint(chunk_df['monthly_repayment'].to_numpy(np.float64) * 100).astype(np.int64),
+        term=chunk_df['term_months'].to_numpy(np.int64),
+        total_interest_p=total_interest_p,
+        contract_dates=contract_dates.dt.normalize().to_numpy('datetime64[D]'),
+        rounding=rounding
+    )
+
+    valid = result['valid']
+    periods_per_loan = valid.sum(axis=1)
+    period_numbers = np.broadcast_to(np.arange(1, valid.shape[1] + 1), valid.shape)
+
+    return pd.DataFrame({
+        'loan_id': np.repeat(chunk_df['loan_id'].to_numpy(), periods_per_loan),
+        'period': period_numbers[valid],
+        'payment_date': np.datetime_as_string(result['payment_date'][valid], unit='D'),
+        'days_in_period': result['days_in_period'][valid],
+        'nominal_apr': np.repeat(result['apr'], periods_per_loan),
+        'opening_balance': result['opening_balance'][valid] / 100,
+        'interest_amount': result['interest_amount'][valid] / 100,
+        'repayment_amount': result['repayment_amount'][valid] / 100,
+        'closing_balance': result['closing_balance'][valid] / 100,
+        'xirr_percent': 0.0
+    })
+
+
+def iter_fixed_point_schedules(loans_df, rounding=HALF_UP, chunk_loans=CHUNK_LOANS):
+    """
+    Yields schedule DataFrames batch by batch.
+    Loans are grouped by term so each batch's matrices are dense (no padding to the longest term),
+    then split into batches of at most `chunk_loans` loans.
+    """
+    for _, term_df in loans_df.groupby('term_months', sort=True):
+        for start in range(0, len(term_df), chunk_loans):
+            yield _build_chunk(term_df.iloc[start:start + chunk_loans], rounding)
+
+
+def generate_fixed_point_schedules(loans_df, rounding=HALF_UP, chunk_loans=CHUNK_LOANS):
+    """
+    Fixed-point alternative to loan_calc.generate_reconciled_schedule for a whole DataFrame of loans.
+    Returns a schedule DataFrame with the same columns (money converted back to pounds at the end).
+    Interest reconciles to each loan's stored 'total_interest' where present.
+    """
+    if loans_df.empty:
+        return pd.DataFrame()
+    return pd.concat(iter_fixed_point_schedules(loans_df, rounding, chunk_loans), ignore_index=True)
+
+
+def main():
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        loans_df = pd.read_sql(f"SELECT * FROM {SOURCE_TABLE}", conn)
+    except Exception as e:
+        print(e)
+        conn.close()
+        return
+
+    loans_df = loans_df[loans_df['monthly_repayment'].notna()].reset_index(drop=True)
+    print(f"Building fixed-point schedules for {len(loans_df)} loans...")
+
+    # Each batch is written as soon as it is built, so the whole book is never held in memory
+    started = time.perf_counter()
+    total_rows = 0
+    loan_rows = pd.DataFrame()
+    for chunk_df in iter_fixed_point_schedules(loans_df):
+        chunk_df.to_sql(TARGET_TABLE, conn, if_exists='replace' if total_rows == 0 else 'append', index=False)
+        total_rows += len(chunk_df)
+        loan_rows = chunk_df[chunk_df['loan_id'] == chunk_df.iloc[-1]['loan_id']]
+    print(f"Built {total_rows} schedule rows in {time.perf_counter() - started:.2f}s")
+
+    if total_rows == 0:
+        conn.close()
+        return
+
+    create_schedule_indexes(conn)
+    conn.close()
+
+    # --- VERIFICATION REPORT ---
+    if not loan_rows.empty:
+        last_id = loan_rows.iloc[-1]['loan_id']
+
+        print("\n--- Fixed-Point Reconciliation Example ---")
+        print(f"Loan ID:             {last_id}")
+        print(f"Sum of Interest Col: {loan_rows['interest_amount'].sum():.2f}")
+        print(f"Sum of Repay Col:    {loan_rows['repayment_amount'].sum():.2f}")
+        print(f"Final Balance:       {loan_rows['closing_balance'].iloc[-1]:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,25 +7,133 @@ from datetime import datetime, date
 DB_FILE = 'loan_data.db'
 SOURCE_TABLE = 'loans'
 TARGET_TABLE = 'repayment_schedules'
+MEMO_TABLE = 'apr_memo'
 
+# APR memo settings
+RATIO_DECIMALS = 8  # Payment/principal ratio precision; keeps the implied payment within a fraction of a penny
+FINAL_BALANCE_TOLERANCE = 0.01  # A reused APR must leave no more than this on the final balance
 
-def calculate_final_balance(apr, principal, pmt, start_date, months):
+
+def get_period_days(start_date, months):
     """
-    Objective function for the Solver.
+    Returns the number of days in each payment period (Act/365 day-count pattern).
     """
-    balance = principal
+    days = []
     current_date = start_date
     for period in range(1, months + 1):
         next_month_date = (pd.to_datetime(start_date) + pd.DateOffset(months=period)).date()
-        days_in_period = (next_month_date - current_date).days
-        daily_rate = (apr / 100) / 365
+        days.append((next_month_date - current_date).days)
+        current_date = next_month_date
+    return days
+
+
+def final_balance_for_days(apr, principal, pmt, period_days):
+    """
+    Objective function for the Solver, using a precomputed day-count pattern.
+    """
+    balance = principal
+    daily_rate = (apr / 100) / 365
+    for days_in_period in period_days:
         interest = balance * daily_rate * days_in_period
         balance = balance + interest - pmt
-        current_date = next_month_date
     return balance
 
 
-def generate_reconciled_schedule(loan):
+def calculate_final_balance(apr, principal, pmt, start_date, months):
+    """
+    Objective function for the Solver.
+    """
+    return final_balance_for_days(apr, principal, pmt, get_period_days(start_date, months))
+
+
+def create_schedule_indexes(conn, table_name=TARGET_TABLE):
+    """
+    Adds secondary indexes to the schedule table (per-loan lookups and payment date ranges).
+    to_sql(if_exists='replace') drops them, so this runs after every rebuild.
+    """
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_loan_period ON {table_name} (loan_id, period)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_payment_date ON {table_name} (payment_date)")
+
+
+# --- APR MEMO ---
+
+def new_apr_memo():
+    """Creates an empty memo: cached APRs plus hit/miss counters."""
+    return {"entries": {}, "new_keys": set(), "hits": 0, "misses": 0, "rejected": 0}
+
+
+def apr_memo_key(principal, pmt, period_days):
+    """
+    Canonical loan shape: (payment/principal ratio, term, day-count pattern).
+    The solved APR only depends on the ratio and on the days in each period, which in turn
+    capture the contract day-of-month and any leap years in the term.
+    """
+    ratio = f"{pmt / principal:.{RATIO_DECIMALS}f}"
+    return ratio, len(period_days), ",".join(str(days) for days in period_days)
+
+
+def load_apr_memo(conn):
+    """Loads the persistent memo table (empty memo if the table does not exist yet)."""
+    memo = new_apr_memo()
+    query = f"SELECT name FROM sqlite_master WHERE type='table' AND name='{MEMO_TABLE}';"
+    if not conn.execute(query).fetchone():
+        return memo
+
+    rows = conn.execute(f"SELECT payment_ratio, term_months, day_pattern, apr FROM {MEMO_TABLE}")
+    for ratio, term_months, day_pattern, apr in rows:
+        memo["entries"][(ratio, term_months, day_pattern)] = apr
+    return memo
+
+
+def save_apr_memo(conn, memo):
+    """Appends the keys solved during this run to the memo table."""
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {MEMO_TABLE} ("
+        "payment_ratio TEXT, term_months INTEGER, day_pattern TEXT, apr REAL, "
+        "PRIMARY KEY (payment_ratio, term_months, day_pattern))"
+    )
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {MEMO_TABLE} VALUES (?, ?, ?, ?)",
+        [(*key, memo["entries"][key]) for key in memo["new_keys"]]
+    )
+    conn.commit()
+    memo["new_keys"].clear()
+
+
+def solve_apr(principal, pmt, period_days, memo=None):
+    """
+    Solves for the APR that clears the loan, reusing a memoised APR for the same loan shape.
+    A reused APR is only accepted if it leaves this loan within FINAL_BALANCE_TOLERANCE;
+    otherwise the loan is solved on its own and the memo entry is left unchanged.
+    """
+    # No ratio exists for a zero principal, so such loans bypass the memo (the solve returns 0.0)
+    key = apr_memo_key(principal, pmt, period_days) if memo is not None and principal > 0 else None
+
+    if key is not None and key in memo["entries"]:
+        cached_apr = memo["entries"][key]
+        if abs(final_balance_for_days(cached_apr, principal, pmt, period_days)) <= FINAL_BALANCE_TOLERANCE:
+            memo["hits"] += 1
+            return cached_apr
+        memo["rejected"] += 1
+
+    try:
+        apr = optimize.brentq(
+            final_balance_for_days, 0.0, 100.0,
+            args=(principal, pmt, period_days),
+            xtol=1e-6
+        )
+    except ValueError:
+        apr = 0.0
+
+    if key is not None:
+        memo["misses"] += 1
+        if key not in memo["entries"]:
+            memo["entries"][key] = apr
+            memo["new_keys"].add(key)
+    return apr
+
+
+def generate_reconciled_schedule(loan, memo=None):
     loan_id = loan['loan_id']
     principal = float(loan['finance_amount'])
     term_months = int(loan['term_months'])
@@ -42,15 +150,8 @@ def generate_reconciled_schedule(loan):
     except:
         start_date = datetime.now().date()
 
-    # --- STEP 2: SOLVE FOR APR ---
-    try:
-        precise_apr = optimize.brentq(
-            calculate_final_balance, 0.0, 100.0,
-            args=(principal, monthly_payment, start_date, term_months),
-            xtol=1e-6
-        )
-    except ValueError:
-        precise_apr = 0.0
+    # --- STEP 2: SOLVE FOR APR (memoised by loan shape) ---
+    precise_apr = solve_apr(principal, monthly_payment, get_period_days(start_date, term_months), memo)
 
     # --- STEP 3: GENERATE SCHEDULE WITH DOUBLE CHECK ---
     schedule = []
@@ -130,6 +231,8 @@ def main():
 
     print(f"Reconciling {len(loans_df)} loans (Fixing Interest & Payables)...")
 
+    memo = load_apr_memo(conn)
+
     all_schedules = []
 
     # For reporting
@@ -139,7 +242,7 @@ def main():
         if pd.isna(row['monthly_repayment']): continue
 
         # Unpack the return values to check accuracy
-        sched, target_int, actual_int = generate_reconciled_schedule(row)
+        sched, target_int, actual_int = generate_reconciled_schedule(row, memo)
         all_schedules.extend(sched)
 
         if abs(target_int - actual_int) > 0.01:
@@ -147,8 +250,16 @@ def main():
 
     schedule_df = pd.DataFrame(all_schedules)
     schedule_df.to_sql(TARGET_TABLE, conn, if_exists='replace', index=False)
+    create_schedule_indexes(conn)
+    save_apr_memo(conn, memo)
     conn.close()
 
+    # --- APR MEMO REPORT ---
+    lookups = memo["hits"] + memo["misses"]
+    if lookups:
+        print(f"APR memo: {memo['hits']}/{lookups} hits ({memo['hits'] / lookups:.1%}), "
+              f"{memo['rejected']} cached APRs rejected by the final-balance check.")
+
     # --- VERIFICATION REPORT ---
     if not schedule_df.empty:
         print("\n--- Final Month Reconciliation Example ---")
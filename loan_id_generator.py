@@ -92,6 +92,15 @@ def get_existing_ids(db_path, table_name):
         return set()
 
 
+def create_loan_indexes(conn, table_name=TABLE_NAME):
+    """
+    Adds secondary indexes for the common portfolio queries (by ID, contract date and car make).
+    Safe to run after every load.
+    """
+    for column in ("loan_id", "contract_date", "car_make"):
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_{column} ON {table_name} ({column})")
+
+
 def main():
     # 1. Load Data
     try:
@@ -114,6 +123,7 @@ def main():
     # 5. Save to Database
     with sqlite3.connect(DB_FILE) as conn:
         df_processed.to_sql(TABLE_NAME, conn, if_exists='append', index=False)
+        create_loan_indexes(conn)
 
     print(f"Success! Saved to '{DB_FILE}' in table '{TABLE_NAME}'.")
     print("\nPreview of new data:")
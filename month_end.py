@@ -0,0 +1,288 @@
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# --- CONFIGURATION ---
+DB_FILE = 'loan_data.db'
+SCHEDULE_TABLE = 'repayment_schedules'
+ALLOCATION_TABLE = 'allocations'  # Optional cash allocations: loan_id, amount, allocation_date
+RESULTS_TABLE = 'month_end_results'
+CHECKPOINT_TABLE = 'month_end_checkpoints'
+PARTITION_SIZE = 10_000  # Loans per work unit
+MAX_WORKERS = os.cpu_count()
+DEFAULT_ARREARS_MONTHS = 3  # Missed instalments that trigger the Default status
+
+_RESULT_COLUMNS = ('run_month', 'loan_id', 'scheduled_balance', 'income_due', 'income_accrued',
+                   'arrears', 'months_in_arrears', 'status', 'write_off')
+
+
+def create_month_end_tables(conn):
+    """
+    Creates the results and checkpoint tables (both keyed so reruns overwrite instead of duplicating)
+    and the indexes the partition queries rely on.
+    """
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {RESULTS_TABLE} (
+            run_month TEXT, loan_id TEXT, scheduled_balance REAL, income_due REAL, income_accrued REAL,
+            arrears REAL, months_in_arrears INTEGER, status TEXT, write_off REAL,
+            PRIMARY KEY (run_month, loan_id)
+        )""")
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+            run_month TEXT, partition_no INTEGER, first_loan_id TEXT, last_loan_id TEXT, loans INTEGER,
+            status TEXT, completed_at TEXT, error TEXT,
+            PRIMARY KEY (run_month, partition_no)
+        )""")
+    # Checkpoint tables created before failures were recorded have no 'error' column
+    checkpoint_columns = [row[1] for row in conn.execute(f"PRAGMA table_info({CHECKPOINT_TABLE})")]
+    if 'error' not in checkpoint_columns:
+        conn.execute(f"ALTER TABLE {CHECKPOINT_TABLE} ADD COLUMN error TEXT")
+
+    # Per-partition lookups by loan_id range: earlier defaults and cash allocated to date
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{RESULTS_TABLE}_defaults "
+                 f"ON {RESULTS_TABLE} (loan_id, run_month) WHERE status = 'Default'")
+    if _table_exists(conn, ALLOCATION_TABLE):
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{ALLOCATION_TABLE}_loan_date "
+                     f"ON {ALLOCATION_TABLE} (loan_id, allocation_date)")
+    conn.commit()
+
+
+def plan_partitions(conn, run_month, partition_size=PARTITION_SIZE):
+    """
+    Splits the book into loan_id ranges and stores them as pending checkpoints.
+    The plan is created once per run month, so a rerun resumes over exactly the same partitions.
+    Returns the (partition, first_loan_id, last_loan_id, loans) tuples still to do, including failed ones.
+    """
+    planned = conn.execute(f"SELECT COUNT(*) FROM {CHECKPOINT_TABLE} WHERE run_month = ?", (run_month,)).fetchone()[0]
+    if not planned:
+        loan_ids = [row[0] for row in conn.execute(f"SELECT DISTINCT loan_id FROM {SCHEDULE_TABLE} ORDER BY loan_id")]
+        plan = [
+            (run_month, number, chunk[0], chunk[-1], len(chunk), 'pending', None, None)
+            for number, chunk in enumerate(
+                loan_ids[start:start + partition_size] for start in range(0, len(loan_ids), partition_size)
+            )
+        ]
+        conn.executemany(f"INSERT INTO {CHECKPOINT_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?)", plan)
+        conn.commit()
+
+    return conn.execute(
+        f"SELECT partition_no, first_loan_id, last_loan_id, loans FROM {CHECKPOINT_TABLE} "
+        "WHERE run_month = ? AND status != 'done' ORDER BY partition_no",
+        (run_month,)
+    ).fetchall()
+
+
+def reset_month_end(conn, run_month):
+    """Forgets all checkpoints and results for a run month, so the next run starts from zero."""
+    conn.execute(f"DELETE FROM {CHECKPOINT_TABLE} WHERE run_month = ?", (run_month,))
+    conn.execute(f"DELETE FROM {RESULTS_TABLE} WHERE run_month = ?", (run_month,))
+    conn.commit()
+
+
+# --- WORK UNIT ---
+
+def _table_exists(conn, table_name):
+    query = f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}';"
+    return conn.execute(query).fetchone() is not None
+
+
+def close_partition(db_file, month_end, first_loan_id, last_loan_id):
+    """
+    Runs every month-end step for the loans in one partition and returns the result rows.
+    Read-only: the parent process writes the rows together with the checkpoint.
+
+    1. Income recognition: interest on charges falling due in the month, plus the daily
+       accrual from the last payment date to month end on the period still running.
+    2. Arrears: instalments due to date less cash allocated to date (none without allocations).
+    3. Status triggers: Default after DEFAULT_ARREARS_MONTHS missed instalments (and for good
+       once defaulted in an earlier run), Settled once the final instalment is due and paid, Live otherwise.
+    4. Write-off: the scheduled balance plus arrears, only in the month the loan first defaults.
+       Defaulted loans recognise no further income.
+    """
+    run_month = month_end.strftime('%Y-%m')
+    with sqlite3.connect(f"file:{db_file}?mode=ro", uri=True) as conn:
+        df = pd.read_sql(
+            f"SELECT loan_id, period, payment_date, days_in_period, opening_balance, interest_amount, "
+            f"repayment_amount, closing_balance FROM {SCHEDULE_TABLE} "
+            "WHERE loan_id BETWEEN ? AND ? ORDER BY loan_id, period",
+            conn, params=(first_loan_id, last_loan_id)
+        )
+        if _table_exists(conn, ALLOCATION_TABLE):
+            paid = pd.read_sql(
+                f"SELECT loan_id, SUM(amount) AS paid FROM {ALLOCATION_TABLE} "
+                "WHERE loan_id BETWEEN ? AND ? AND allocation_date <= ? GROUP BY loan_id",
+                conn, params=(first_loan_id, last_loan_id, month_end.isoformat())
+            ).set_index('loan_id')['paid'].astype(float)  # An empty result comes back as object dtype
+        else:
+            paid = None
+        previously_defaulted = pd.read_sql(
+            f"SELECT DISTINCT loan_id FROM {RESULTS_TABLE} "
+            "WHERE loan_id BETWEEN ? AND ? AND run_month < ? AND status = 'Default'",
+            conn, params=(first_loan_id, last_loan_id, run_month)
+        )['loan_id']
+
+    period_end = pd.Timestamp(month_end)
+    period_start = period_end.replace(day=1)
+    payment_date = pd.to_datetime(df['payment_date'])
+    instalment_start = payment_date - pd.to_timedelta(df['days_in_period'], unit='D')
+
+    fallen_due = payment_date <= period_end
+    due_this_month = fallen_due & (payment_date >= period_start)
+    running = ~fallen_due & (instalment_start < period_end)
+    days_elapsed = (period_end - instalment_start).dt.days
+
+    df['income_due'] = df['interest_amount'].where(due_this_month, 0.0)
+    df['income_accrued'] = (df['interest_amount'] * days_elapsed / df['days_in_period']).where(running, 0.0)
+    df['due_to_date'] = df['repayment_amount'].where(fallen_due, 0.0)
+    df['balance_to_date'] = df['closing_balance'].where(fallen_due)
+    df['maturity_date'] = payment_date
+
+    loans = df.groupby('loan_id', sort=True).agg(
+        income_due=('income_due', 'sum'),
+        income_accrued=('income_accrued', 'sum'),
+        due_to_date=('due_to_date', 'sum'),
+        scheduled_balance=('balance_to_date', 'last'),
+        principal=('opening_balance', 'first'),
+        instalment=('repayment_amount', 'first'),
+        maturity_date=('maturity_date', 'max')
+    )
+    loans['scheduled_balance'] = loans['scheduled_balance'].fillna(loans['principal'])
+
+    paid_to_date = loans['due_to_date'] if paid is None else paid.reindex(loans.index, fill_value=0.0)
+    arrears = (loans['due_to_date'] - paid_to_date).clip(lower=0).round(2)
+    months_in_arrears = np.floor((arrears + 0.005) / loans['instalment']).astype(int)
+
+    already_defaulted = loans.index.isin(previously_defaulted)
+    status = np.select(
+        [already_defaulted | (months_in_arrears >= DEFAULT_ARREARS_MONTHS),
+         (loans['maturity_date'] <= period_end) & (arrears == 0)],
+        ['Default', 'Settled'],
+        default='Live'
+    )
+    defaulted = status == 'Default'
+    write_off = np.where(defaulted & ~already_defaulted, loans['scheduled_balance'] + arrears, 0.0)
+    loans.loc[defaulted, ['income_due', 'income_accrued']] = 0.0
+
+    return list(zip(
+        [run_month] * len(loans),
+        loans.index,
+        loans['scheduled_balance'].round(2),
+        loans['income_due'].round(2),
+        loans['income_accrued'].round(2),
+        arrears,
+        months_in_arrears.tolist(),
+        status.tolist(),
+        np.round(write_off, 2).tolist()
+    ))
+
+
+# --- ORCHESTRATION ---
+
+def _commit_partition(conn, run_month, partition, rows):
+    """Writes a partition's results and marks it done in a single transaction (idempotent on rerun)."""
+    with conn:
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {RESULTS_TABLE} ({', '.join(_RESULT_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(_RESULT_COLUMNS))})",
+            [tuple(float(v) if isinstance(v, np.floating) else v for v in row) for row in rows]
+        )
+        conn.execute(
+            f"UPDATE {CHECKPOINT_TABLE} SET status = 'done', completed_at = ?, error = NULL "
+            "WHERE run_month = ? AND partition_no = ?",
+            (datetime.now().isoformat(timespec='seconds'), run_month, partition)
+        )
+
+
+def _fail_partition(conn, run_month, partition, error):
+    """Marks a partition failed with its error; the next run retries it."""
+    with conn:
+        conn.execute(
+            f"UPDATE {CHECKPOINT_TABLE} SET status = 'failed', completed_at = ?, error = ? "
+            "WHERE run_month = ? AND partition_no = ?",
+            (datetime.now().isoformat(timespec='seconds'), f"{type(error).__name__}: {error}", run_month, partition)
+        )
+
+
+def _print_progress(done_loans, total_loans, done_parts, total_parts, started):
+    elapsed = time.perf_counter() - started
+    throughput = done_loans / elapsed if elapsed > 0 else 0.0
+    eta = (total_loans - done_loans) / throughput if throughput > 0 else float('inf')
+    print(f"  {done_parts}/{total_parts} partitions | {done_loans:,}/{total_loans:,} loans | "
+          f"{throughput:,.0f} loans/s | ETA {eta:,.0f}s")
+
+
+def run_month_end(month_end, db_file=DB_FILE, partition_size=PARTITION_SIZE, max_workers=MAX_WORKERS):
+    """
+    Runs the month-end close for `month_end` (the last day of the month), partition by partition.
+    Finished partitions are checkpointed in SQLite; rerunning after a crash only processes the rest.
+    A partition that raises is marked 'failed' with its error while the others are still committed;
+    a RuntimeError listing the failures is raised once the pool has finished.
+    """
+    run_month = month_end.strftime('%Y-%m')
+    conn = sqlite3.connect(db_file)
+    conn.execute("PRAGMA journal_mode=WAL")  # Lets the workers read while results are being written
+    create_month_end_tables(conn)
+
+    pending = plan_partitions(conn, run_month, partition_size)
+    total_parts = len(pending)
+    total_loans = sum(part[3] for part in pending)
+    if not pending:
+        print(f"Month end {run_month} is already complete.")
+        conn.close()
+        return
+
+    print(f"Month end {run_month}: {total_parts} partitions ({total_loans:,} loans) to process...")
+    started = time.perf_counter()
+    done_loans = done_parts = 0
+    failed = []
+
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(close_partition, db_file, month_end, first_id, last_id): (partition, loans)
+                for partition, first_id, last_id, loans in pending
+            }
+            for future in as_completed(futures):
+                partition, loans = futures[future]
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    _fail_partition(conn, run_month, partition, e)
+                    failed.append(partition)
+                    print(f"  Partition {partition} failed: {e}")
+                    continue
+                _commit_partition(conn, run_month, partition, rows)
+                done_loans += loans
+                done_parts += 1
+                _print_progress(done_loans, total_loans, done_parts, total_parts, started)
+    finally:
+        conn.close()
+
+    if failed:
+        raise RuntimeError(f"Month end {run_month}: {len(failed)} partition(s) failed {sorted(failed)}; "
+                           f"see {CHECKPOINT_TABLE}.error and rerun to retry them.")
+    print(f"Month end {run_month} finished in {time.perf_counter() - started:.1f}s.")
+
+
+def main():
+    # Defaults to the last completed month; pass YYYY-MM-DD to close a specific month end
+    if len(sys.argv) > 1:
+        month_end = date.fromisoformat(sys.argv[1])
+    else:
+        month_end = date.today().replace(day=1) - timedelta(days=1)
+
+    if not os.path.exists(DB_FILE):
+        print(f"Error: {DB_FILE} not found.")
+        return
+
+    run_month_end(month_end)
+
+
+if __name__ == "__main__":
+    main()
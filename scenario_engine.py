@@ -0,0 +1,239 @@
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+# --- CONFIGURATION ---
+DB_FILE = 'loan_data.db'
+SOURCE_TABLE = 'repayment_schedules'
+TARGET_TABLE = 'scenario_results'
+MAX_WORKERS = os.cpu_count()
+CHUNK_ROWS = 2_000_000  # Schedule rows processed per pass inside a worker (bounds temporary memory)
+
+# Worker-side views onto the shared base schedule (filled by _attach_base_schedule)
+_BASE = {}
+_BASE_HANDLES = []
+
+
+def _as_curve(values, max_term):
+    """
+    Turns a scalar or a per-period list into a vector of length `max_term`.
+    Short vectors are extended with their last value (a flat tail).
+    """
+    curve = np.atleast_1d(np.asarray(values, dtype=np.float64))
+    if len(curve) < max_term:
+        curve = np.concatenate([curve, np.full(max_term - len(curve), curve[-1])])
+    return curve[:max_term]
+
+
+def build_scenario(name, prepayment_cpr, default_cdr, recovery_rate, max_term=84):
+    """
+    Builds a scenario dictionary from annualised rates.
+    CPR (prepayment) and CDR (default) are given in % per year, either as a single
+    number or as a per-period curve, and converted to monthly hazards:
+    Monthly Rate = 1 - (1 - Annual Rate) ^ (1/12)
+    """
+    cpr = _as_curve(prepayment_cpr, max_term) / 100
+    cdr = _as_curve(default_cdr, max_term) / 100
+
+    return {
+        'name': name,
+        'prepayment': 1 - (1 - cpr) ** (1 / 12),  # SMM: single monthly mortality
+        'default': 1 - (1 - cdr) ** (1 / 12),  # MDR: monthly default rate
+        'recovery_rate': float(recovery_rate)
+    }
+
+
+def load_base_schedule(conn):
+    """
+    Reads the contractual schedules into flat column arrays, one entry per schedule row.
+    Payment dates are converted into a month index counted from the first payment month.
+    """
+    df = pd.read_sql(
+        f"SELECT period, payment_date, opening_balance, interest_amount, closing_balance FROM {SOURCE_TABLE}",
+        conn
+    )
+    payment_dates = pd.to_datetime(df['payment_date'])
+    month_index = (payment_dates.dt.year * 12 + payment_dates.dt.month - 1).to_numpy(np.int64)
+    first_month = int(month_index.min())
+
+    base = {
+        'period': df['period'].to_numpy(np.int32),
+        'month_index': (month_index - first_month).astype(np.int32),
+        'opening_balance': df['opening_balance'].to_numpy(np.float64),
+        'interest_amount': df['interest_amount'].to_numpy(np.float64),
+        'closing_balance': df['closing_balance'].to_numpy(np.float64)
+    }
+    return base, first_month
+
+
+# --- SHARED MEMORY ---
+
+def _share_base_schedule(base):
+    """
+    Copies every base array into its own shared memory block.
+    Returns the blocks (so the caller can release them) and a picklable layout
+    the workers use to attach to them.
+    """
+    blocks = []
+    layout = {}
+    for column, values in base.items():
+        block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+        blocks.append(block)
+        layout[column] = (block.name, values.dtype.str, len(values))
+    return blocks, layout
+
+
+def _attach_base_schedule(layout):
+    """Pool initializer: maps the shared blocks into the worker without copying."""
+    for column, (block_name, dtype, length) in layout.items():
+        try:
+            # The parent owns the blocks, so the worker must not track (and later unlink) them
+            block = shared_memory.SharedMemory(name=block_name, track=False)
+        except TypeError:
+            # Python < 3.13: workers share the parent's resource tracker, which ignores the repeat registration
+            block = shared_memory.SharedMemory(name=block_name)
+        _BASE_HANDLES.append(block)
+        _BASE[column] = np.ndarray((length,), dtype=np.dtype(dtype), buffer=block.buf)
+
+
+# --- SCENARIO EVALUATION ---
+
+def evaluate_scenario(scenario, n_months, base=None):
+    """
+    Applies the scenario hazards to every schedule row and sums the result by calendar month.
+
+    For the pool of loans at period p, with S(p) the share still on book after period p:
+        Defaults     = S(p-1) * MDR(p) * Opening Balance
+        Interest     = S(p-1) * (1 - MDR(p)) * Scheduled Interest
+        Prepayments  = S(p-1) * (1 - MDR(p)) * SMM(p) * Scheduled Closing Balance
+        Balance      = S(p) * Scheduled Closing Balance
+    where S(p) = S(p-1) * (1 - MDR(p)) * (1 - SMM(p)).
+    """
+    base = _BASE if base is None else base
+    smm = scenario['prepayment']
+    mdr = scenario['default']
+    recovery_rate = scenario['recovery_rate']
+
+    # Factors indexed directly by period number (index 0 is unused)
+    survival = np.concatenate([[1.0], np.cumprod((1 - mdr) * (1 - smm))])
+    alive_start = survival[:-1]
+    default_factor = np.concatenate([[0.0], alive_start * mdr])
+    performing_factor = np.concatenate([[0.0], alive_start * (1 - mdr)])
+    prepayment_factor = np.concatenate([[0.0], alive_start * (1 - mdr) * smm])
+
+    curves = {key: np.zeros(n_months) for key in ('balance', 'interest_income', 'prepayments', 'defaults')}
+
+    total_rows = len(base['period'])
+    for start in range(0, total_rows, CHUNK_ROWS):
+        stop = min(start + CHUNK_ROWS, total_rows)
+        period = base['period'][start:stop]
+        month = base['month_index'][start:stop]
+        closing = base['closing_balance'][start:stop]
+
+        weights = {
+            'balance': survival[period] * closing,
+            'interest_income': performing_factor[period] * base['interest_amount'][start:stop],
+            'prepayments': prepayment_factor[period] * closing,
+            'defaults': default_factor[period] * base['opening_balance'][start:stop]
+        }
+        for key, values in weights.items():
+            curves[key] += np.bincount(month, weights=values, minlength=n_months)
+
+    curves['recoveries'] = curves['defaults'] * recovery_rate
+    curves['losses'] = curves['defaults'] - curves['recoveries']
+    return scenario['name'], curves
+
+
+def _timed_evaluation(scenario, n_months):
+    started = time.perf_counter()
+    name, curves = evaluate_scenario(scenario, n_months)
+    return name, curves, time.perf_counter() - started
+
+
+def run_scenarios(base, first_month, scenarios, max_workers=MAX_WORKERS):
+    """
+    Evaluates all scenarios in parallel across a process pool.
+    The base schedule is placed in shared memory once, so each worker reads the same
+    arrays instead of receiving its own pickled copy.
+    Returns one long DataFrame with a row per scenario and calendar month.
+    """
+    if len(base['period']) == 0 or not scenarios:
+        return pd.DataFrame()
+
+    max_term = int(base['period'].max())
+    for scenario in scenarios:
+        if len(scenario['prepayment']) < max_term or len(scenario['default']) < max_term:
+            raise ValueError(f"Scenario '{scenario['name']}' is shorter than the longest term ({max_term} months).")
+
+    n_months = int(base['month_index'].max()) + 1
+    blocks, layout = _share_base_schedule(base)
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_attach_base_schedule,
+                                 initargs=(layout,)) as pool:
+            futures = [pool.submit(_timed_evaluation, scenario, n_months) for scenario in scenarios]
+            for future in futures:
+                name, curves, seconds = future.result()
+                print(f"Scenario '{name}' evaluated in {seconds:.2f}s")
+                frame = pd.DataFrame(curves)
+                frame.insert(0, 'month', [_month_label(first_month + m) for m in range(n_months)])
+                frame.insert(0, 'scenario', name)
+                results.append(frame)
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    return pd.concat(results, ignore_index=True)
+
+
+def _month_label(month_index):
+    """Converts a month index (year * 12 + month - 1) back into 'YYYY-MM'."""
+    return f"{month_index // 12}-{month_index % 12 + 1:02d}"
+
+
+def default_scenarios(max_term=84):
+    """A starter grid of prepayment, default and recovery assumptions."""
+    scenarios = []
+    for cpr in (0, 5, 10, 20):
+        for cdr in (0, 1, 3, 6, 10):
+            for recovery in (0.6, 0.4):
+                name = f"CPR{cpr}_CDR{cdr}_REC{int(recovery * 100)}"
+                scenarios.append(build_scenario(name, cpr, cdr, recovery, max_term))
+    return scenarios
+
+
+def main():
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        base, first_month = load_base_schedule(conn)
+    except Exception as e:
+        print(e)
+        conn.close()
+        return
+
+    if len(base['period']) == 0:
+        print(f"No rows found in '{SOURCE_TABLE}'.")
+        conn.close()
+        return
+
+    scenarios = default_scenarios(max_term=int(base['period'].max()))
+    print(f"Running {len(scenarios)} scenarios over {len(base['period'])} schedule rows...")
+
+    started = time.perf_counter()
+    results_df = run_scenarios(base, first_month, scenarios)
+    print(f"All scenarios finished in {time.perf_counter() - started:.2f}s")
+
+    results_df.to_sql(TARGET_TABLE, conn, if_exists='replace', index=False)
+    conn.close()
+    print(f"Saved {len(results_df)} rows to table '{TARGET_TABLE}'.")
+
+
+if __name__ == "__main__":
+    main()
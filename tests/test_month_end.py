@@ -0,0 +1,74 @@
+import os
+import sqlite3
+import sys
+from datetime import date
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import month_end
+
+
+def _write_book(db_file, loan_ids, paying_ids):
+    """Twelve monthly instalments of 100.00 from 2024-01-15 per loan; `paying_ids` pay every one on time."""
+    schedule, allocations = [], []
+    contract_date = pd.Timestamp('2024-01-15')
+    for loan_id in loan_ids:
+        balance = 1100.0
+        for period in range(1, 13):
+            payment_date = contract_date + pd.DateOffset(months=period)
+            previous_date = contract_date + pd.DateOffset(months=period - 1)
+            schedule.append({
+                'loan_id': loan_id,
+                'period': period,
+                'payment_date': payment_date.date().isoformat(),
+                'days_in_period': (payment_date - previous_date).days,
+                'opening_balance': balance,
+                'interest_amount': 10.0,
+                'repayment_amount': 100.0,
+                'closing_balance': round(balance - 90.0, 2)
+            })
+            balance = round(balance - 90.0, 2)
+            if loan_id in paying_ids:
+                allocations.append({'loan_id': loan_id, 'amount': 100.0,
+                                    'allocation_date': payment_date.date().isoformat()})
+
+    with sqlite3.connect(db_file) as conn:
+        pd.DataFrame(schedule).to_sql(month_end.SCHEDULE_TABLE, conn, index=False)
+        pd.DataFrame(allocations, columns=['loan_id', 'amount', 'allocation_date']).to_sql(
+            month_end.ALLOCATION_TABLE, conn, index=False)
+        month_end.create_month_end_tables(conn)
+
+
+def test_partition_without_allocations(tmp_path):
+    db_file = str(tmp_path / 'book.db')
+    _write_book(db_file, ['L00000', 'L00001', 'L00002', 'L00003'], paying_ids={'L00000', 'L00001'})
+
+    # The second partition has an allocations table but no rows in it
+    rows = month_end.close_partition(db_file, date(2024, 7, 31), 'L00002', 'L00003')
+
+    assert [row[1] for row in rows] == ['L00002', 'L00003']
+    for row in rows:
+        assert row[5] == 600.0  # Six instalments due, nothing paid
+        assert row[7] == 'Default'
+
+
+def test_write_off_only_in_first_default_month(tmp_path):
+    db_file = str(tmp_path / 'book.db')
+    _write_book(db_file, ['L00000', 'L00001'], paying_ids={'L00000'})
+
+    july = month_end.close_partition(db_file, date(2024, 7, 31), 'L00000', 'L00001')
+    with sqlite3.connect(db_file) as conn:
+        month_end._commit_partition(conn, '2024-07', 0, july)
+    august = month_end.close_partition(db_file, date(2024, 8, 31), 'L00000', 'L00001')
+
+    july_default, august_default = july[1], august[1]
+    assert july_default[7] == august_default[7] == 'Default'
+    assert july_default[8] > 0
+    assert august_default[8] == 0.0
+    # No income is recognised on a defaulted loan
+    assert july_default[3] == july_default[4] == 0.0
+    assert august_default[3] == august_default[4] == 0.0
+    # The performing loan keeps recognising income
+    assert august[0][3] == 10.0